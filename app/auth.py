@@ -1,18 +1,41 @@
 """
-API Key Authentication for Free Tier
-Simple API key validation without database
+API Key Authentication
+Keys are loaded from a JSON file and/or a Redis hash into an in-memory
+index keyed by SHA-256 digest, and reloaded in the background.
+
+Key file format (API_KEYS_FILE):
+    {"keys": [{"id": "acme", "key_sha256": "<hex>", "daily_limit": 50000, "tier": "pro"}]}
+    ("key" may be given instead of "key_sha256" and is hashed on load)
+
+Redis format (API_KEYS_REDIS_HASH):
+    HSET apikeys <sha256 hex> '{"id": "acme", "daily_limit": 50000, "tier": "pro"}'
 """
 
 import os
+import json
+import time
 import logging
 import hashlib
-from typing import Optional, Tuple
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.quota import FREE_DAILY_LIMIT, REDIS_AVAILABLE, r
 
 logger = logging.getLogger(__name__)
 
-# Free tier API key (stored in environment)
+# Free tier API key (stored in environment), always present in the index
 FREE_API_KEY = os.getenv("FREE_API_KEY", "freeApiluminascalem!+|I1,R1u31C_V")
-FREE_API_KEY_HASH = hashlib.sha256(FREE_API_KEY.encode()).hexdigest()
+FREE_API_KEY_NAME = "freeApiluminascalem"
+
+API_KEYS_FILE = os.getenv("API_KEYS_FILE", "")
+API_KEYS_REDIS_HASH = os.getenv("API_KEYS_REDIS_HASH", "")
+API_KEYS_RELOAD_SECONDS = int(os.getenv("API_KEYS_RELOAD_SECONDS", "30"))
+
+
+class ApiKey(NamedTuple):
+    id: str
+    daily_limit: int
+    tier: str
 
 
 def hash_api_key(key: str) -> str:
@@ -20,35 +43,168 @@ def hash_api_key(key: str) -> str:
     return hashlib.sha256(key.encode()).hexdigest()
 
 
-def validate_api_key(api_key: Optional[str]) -> Tuple[bool, str]:
+_FREE_API_KEY_HASH = hash_api_key(FREE_API_KEY)
+_FREE_API_KEY_RECORD = ApiKey(FREE_API_KEY_NAME, FREE_DAILY_LIMIT, "free")
+
+# digest -> ApiKey; replaced wholesale on reload so readers never see a partial index
+_key_index: Dict[str, ApiKey] = {_FREE_API_KEY_HASH: _FREE_API_KEY_RECORD}
+
+_file_mtime: Optional[float] = None
+_file_keys: Dict[str, ApiKey] = {}  # parsed API_KEYS_FILE, reused while its mtime is unchanged
+_reload_thread: Optional[threading.Thread] = None
+
+
+def _parse_key_entry(entry: dict, digest: Optional[str] = None) -> Tuple[str, ApiKey]:
+    if digest is None:
+        if "key_sha256" in entry:
+            digest = str(entry["key_sha256"]).lower()
+        elif "key" in entry:
+            digest = hash_api_key(str(entry["key"]))
+        else:
+            raise ValueError("missing key or key_sha256")
+
+    return digest, ApiKey(
+        id=str(entry["id"]),
+        daily_limit=int(entry.get("daily_limit", FREE_DAILY_LIMIT)),
+        tier=str(entry.get("tier", "free")),
+    )
+
+
+def _load_file_keys() -> Dict[str, ApiKey]:
+    with open(API_KEYS_FILE, "r") as f:
+        data = json.load(f)
+
+    keys = {}
+    for entry in data.get("keys", []):
+        if not entry.get("enabled", True):
+            continue
+        try:
+            digest, record = _parse_key_entry(entry)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Skipping invalid key entry in {API_KEYS_FILE}: {e}")
+            continue
+        keys[digest] = record
+    return keys
+
+
+def _load_redis_keys() -> Dict[str, ApiKey]:
+    keys = {}
+    for digest, raw in r.hgetall(API_KEYS_REDIS_HASH).items():
+        try:
+            entry = json.loads(raw)
+            if not entry.get("enabled", True):
+                continue
+            digest, record = _parse_key_entry(entry, digest=digest.lower())
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Skipping invalid key entry in Redis hash {API_KEYS_REDIS_HASH}: {e}")
+            continue
+        keys[digest] = record
+    return keys
+
+
+def reload_api_keys(force: bool = False) -> int:
+    """
+    Rebuild the in-memory key index from the configured sources.
+
+    The file is only re-read when its mtime changes (or force=True). If a
+    source fails to load, the previous index is kept.
+
+    Returns:
+        Number of keys in the index
+    """
+    global _key_index, _file_mtime, _file_keys
+
+    file_changed = False
+    if API_KEYS_FILE:
+        try:
+            mtime = os.path.getmtime(API_KEYS_FILE)
+            file_changed = mtime != _file_mtime
+        except OSError as e:
+            logger.error(f"API key file unavailable: {e}")
+            return len(_key_index)
+
+    use_redis = bool(API_KEYS_REDIS_HASH) and REDIS_AVAILABLE and r is not None
+    if not (force or file_changed or use_redis):
+        return len(_key_index)
+
+    index = {_FREE_API_KEY_HASH: _FREE_API_KEY_RECORD}
+    try:
+        if API_KEYS_FILE:
+            if force or file_changed:
+                _file_keys = _load_file_keys()
+                _file_mtime = mtime
+            index.update(_file_keys)
+        if use_redis:
+            index.update(_load_redis_keys())
+    except Exception as e:
+        logger.error(f"API key reload failed, keeping previous keys: {e}")
+        return len(_key_index)
+
+    if index != _key_index:
+        _key_index = index
+        logger.info(f"Loaded {len(index)} API keys")
+
+    return len(_key_index)
+
+
+def _reload_loop():
+    while True:
+        time.sleep(API_KEYS_RELOAD_SECONDS)
+        reload_api_keys()
+
+
+def start_api_key_reloader():
+    """Load keys and start the background reload thread (idempotent)"""
+    global _reload_thread
+
+    reload_api_keys(force=True)
+
+    if _reload_thread is not None or not (API_KEYS_FILE or API_KEYS_REDIS_HASH):
+        return
+
+    _reload_thread = threading.Thread(target=_reload_loop,
+                                      name="api-key-reloader",
+                                      daemon=True)
+    _reload_thread.start()
+    logger.info(f"API key hot reload every {API_KEYS_RELOAD_SECONDS}s")
+
+
+def validate_api_key(api_key: Optional[str]) -> Tuple[bool, str, Optional[ApiKey]]:
     """
-    Validate API key for free tier.
-    
+    Validate API key against the in-memory key index.
+
     Args:
         api_key: API key from request header (X-API-Key)
-        
+
     Returns:
-        Tuple of (is_valid, message)
+        Tuple of (is_valid, message, key record or None)
     """
     if not api_key:
-        logger.warning("No API key provided")
-        return False, "Missing X-API-Key header"
-    
+        logger.debug("No API key provided")
+        return False, "Missing X-API-Key header", None
+
     if not api_key.strip():
-        logger.warning("Empty API key provided")
-        return False, "API key cannot be empty"
-    
-    # Hash provided key and compare
+        logger.debug("Empty API key provided")
+        return False, "API key cannot be empty", None
+
+    # Hash provided key and look it up; the index is keyed by digest, so the
+    # lookup cost does not depend on how much of the key an attacker guessed
     provided_hash = hash_api_key(api_key)
-    
-    if provided_hash == FREE_API_KEY_HASH:
-        logger.info("✅ Valid free tier API key")
-        return True, "Valid"
-    else:
-        logger.warning(f"❌ Invalid API key attempt")
-        return False, "Invalid API key"
+
+    record = _key_index.get(provided_hash)
+
+    if record is not None:
+        return True, "Valid", record
+
+    logger.debug("Invalid API key attempt")
+    return False, "Invalid API key", None
+
+
+def get_api_key_count() -> int:
+    """Number of keys currently loaded"""
+    return len(_key_index)
 
 
 def get_free_api_key_name() -> str:
     """Get the free tier API key name for documentation"""
-    return "freeApiluminascalem"
+    return FREE_API_KEY_NAME
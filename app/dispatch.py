@@ -0,0 +1,137 @@
+"""
+Load-aware routing across several API nodes.
+Polls each node's GET /load report and picks the node with the lowest
+estimated wait, preferring nodes that already have the requested GFPGAN
+version resident. Nodes run model jobs off their event loop, so /load
+answers even during long jobs; a node that fails or times out
+DISPATCH_MAX_FAILURES polls in a row is drained until it reports again.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_POLL_SECONDS = float(os.getenv("DISPATCH_POLL_SECONDS", "1.0"))
+DISPATCH_POLL_TIMEOUT = float(os.getenv("DISPATCH_POLL_TIMEOUT", "0.5"))
+DISPATCH_MAX_FAILURES = int(os.getenv("DISPATCH_MAX_FAILURES", "3"))
+DISPATCH_DEFAULT_P95_MS = float(os.getenv("DISPATCH_DEFAULT_P95_MS", "2000"))
+DISPATCH_MODEL_LOAD_PENALTY_MS = float(os.getenv("DISPATCH_MODEL_LOAD_PENALTY_MS", "5000"))
+
+SUPPORTED_VERSIONS = ("v1.2", "v1.3", "v1.4")
+
+
+class Node:
+    """State the dispatcher keeps for one API instance"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = False
+        self.failures = 0
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.p95_ms: Optional[float] = None
+        self.models_resident: List[str] = []
+        self.pending = 0  # requests this dispatcher has sent and not yet seen finish
+        self.last_report: Optional[float] = None
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "p95_ms": self.p95_ms,
+            "models_resident": self.models_resident,
+            "pending": self.pending,
+            "last_report_age_s": (round(time.monotonic() - self.last_report, 2)
+                                  if self.last_report is not None else None),
+        }
+
+
+def normalize_version(version: Optional[str]) -> str:
+    """Mirror the pipeline's fallback so routing matches what the node will load"""
+    return version if version in SUPPORTED_VERSIONS else "v1.4"
+
+
+class NodePool:
+    """Health-weighted pool of API nodes"""
+
+    def __init__(self, urls: Iterable[str]):
+        self.nodes: Dict[str, Node] = {}
+        for url in urls:
+            node = Node(url)
+            self.nodes[node.url] = node
+
+    def score(self, node: Node, version: str) -> float:
+        """
+        Estimated wait in milliseconds if a request were sent to ``node``.
+
+        Outstanding work is the larger of the node's last report and what
+        this dispatcher has sent since, each item costing the node's recent
+        p95. Nodes without ``version`` resident pay a model load penalty.
+        """
+        outstanding = max(node.in_flight, node.pending)
+        p95_ms = node.p95_ms if node.p95_ms is not None else DISPATCH_DEFAULT_P95_MS
+        score = (outstanding + 1) * p95_ms
+        if version not in node.models_resident:
+            score += DISPATCH_MODEL_LOAD_PENALTY_MS
+        return score
+
+    def choose(self, version: str, exclude: Iterable[str] = ()) -> Optional[Node]:
+        """Pick the healthy node with the lowest score, or None if all are drained"""
+        excluded = set(exclude)
+        candidates = [n for n in self.nodes.values() if n.healthy and n.url not in excluded]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda n: (self.score(n, version), n.pending))
+
+    def update(self, node: Node, report: dict):
+        """Apply a load report from the node"""
+        if not node.healthy:
+            logger.info(f"Node {node.url} is healthy")
+        node.healthy = True
+        node.failures = 0
+        node.in_flight = int(report.get("in_flight", 0))
+        node.queue_depth = int(report.get("queue_depth", 0))
+        node.p95_ms = report.get("p95_ms")
+        node.models_resident = list(report.get("models_resident", []))
+        node.last_report = time.monotonic()
+
+    def mark_failure(self, node: Node):
+        """Record a failed poll or connection; drain after repeated failures"""
+        node.failures += 1
+        if node.healthy and node.failures >= DISPATCH_MAX_FAILURES:
+            node.healthy = False
+            logger.warning(f"Node {node.url} drained after {node.failures} failures")
+
+    def mark_served(self, node: Node, version: str):
+        """A node that just served ``version`` now has only that version resident"""
+        node.models_resident = [version]
+
+    async def poll_node(self, client: httpx.AsyncClient, node: Node):
+        try:
+            response = await client.get(f"{node.url}/load", timeout=DISPATCH_POLL_TIMEOUT)
+            response.raise_for_status()
+            self.update(node, response.json())
+        except (httpx.HTTPError, ValueError) as e:
+            # Includes read timeouts: a hung or frozen node must not stay eligible
+            logger.debug(f"Load poll failed for {node.url}: {e}")
+            self.mark_failure(node)
+
+    async def poll_once(self, client: httpx.AsyncClient):
+        await asyncio.gather(*(self.poll_node(client, n) for n in self.nodes.values()))
+
+    async def poll_forever(self, client: httpx.AsyncClient):
+        while True:
+            await self.poll_once(client)
+            await asyncio.sleep(DISPATCH_POLL_SECONDS)
+
+    def snapshot(self) -> List[dict]:
+        return [n.snapshot() for n in self.nodes.values()]
@@ -0,0 +1,95 @@
+"""
+Node load tracking for the multi-node dispatcher.
+Counts in-flight /enhance requests and keeps a window of recent
+durations so each node can report its load cheaply via GET /load.
+Model work runs one job at a time in a worker thread (run_model), so the
+event loop stays free to answer /load and waiting jobs show up as
+queue_depth.
+"""
+
+import os
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+LOAD_WINDOW_SIZE = int(os.getenv("LOAD_WINDOW_SIZE", "200"))
+
+_lock = threading.Lock()
+_in_flight = 0
+_processing = 0
+_durations_ms: Deque[float] = deque(maxlen=LOAD_WINDOW_SIZE)
+
+# The GFPGANer and its face helper are shared module state, so only one
+# job may use them at a time; the rest wait here and count as queued
+_model_slot = asyncio.Semaphore(1)
+
+
+def request_started():
+    """Mark an /enhance request as accepted"""
+    global _in_flight
+    with _lock:
+        _in_flight += 1
+
+
+def request_finished(duration_ms: Optional[float] = None):
+    """Mark an /enhance request as done, recording its duration if given"""
+    global _in_flight
+    with _lock:
+        _in_flight = max(0, _in_flight - 1)
+        if duration_ms is not None:
+            _durations_ms.append(duration_ms)
+
+
+def processing_started():
+    """Mark that a request has reached the model (no longer queued)"""
+    global _processing
+    with _lock:
+        _processing += 1
+
+
+def processing_finished():
+    global _processing
+    with _lock:
+        _processing = max(0, _processing - 1)
+
+
+async def run_model(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking model call in a worker thread, one job at a time.
+
+    Returns:
+        Whatever ``func`` returns
+    """
+    async with _model_slot:
+        processing_started()
+        try:
+            return await run_in_threadpool(func, *args, **kwargs)
+        finally:
+            processing_finished()
+
+
+def get_load_report() -> dict:
+    """
+    Snapshot of current load.
+
+    Returns:
+        Dict with in_flight, queue_depth, p95_ms and sample count
+    """
+    with _lock:
+        in_flight = _in_flight
+        processing = _processing
+        durations = sorted(_durations_ms)
+
+    p95_ms = None
+    if durations:
+        p95_ms = round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 2)
+
+    return {
+        "in_flight": in_flight,
+        "queue_depth": max(0, in_flight - processing),
+        "p95_ms": p95_ms,
+        "samples": len(durations),
+    }
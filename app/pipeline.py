@@ -5,8 +5,9 @@ Optimized for CPU inference speed.
 """
 
 import os
+import time
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 import numpy as np
 import cv2
 import torch
@@ -51,6 +52,19 @@ _patch_basicsr()
 from gfpgan import GFPGANer
 from realesrgan import RealESRGANer
 from realesrgan.archs.srvgg_arch import SRVGGNetCompact
+from basicsr.utils import img2tensor, tensor2img
+from torchvision.transforms.functional import normalize
+
+# Approximate 5-point landmark positions (left eye, right eye, nose,
+# left mouth corner, right mouth corner) relative to a tight face box.
+# Used to align faces when clients send boxes instead of landmarks.
+BOX_LANDMARK_RATIOS = np.array([
+    [0.30, 0.40],
+    [0.70, 0.40],
+    [0.50, 0.58],
+    [0.35, 0.76],
+    [0.65, 0.76],
+], dtype=np.float32)
 
 
 def _get_face_enhancer(version: str = "v1.4"):
@@ -95,6 +109,11 @@ def _get_face_enhancer(version: str = "v1.4"):
     return _face_enhancer
 
 
+def get_loaded_versions() -> List[str]:
+    """GFPGAN versions currently resident in memory"""
+    return [_current_version] if _face_enhancer is not None else []
+
+
 def preload_models():
     logger.info("Pre-loading GFPGAN models at startup...")
     try:
@@ -111,27 +130,122 @@ def _cap_input_size(image: np.ndarray) -> np.ndarray:
         ratio = (MAX_INPUT_PIXELS / pixels) ** 0.5
         new_w = int(w * ratio)
         new_h = int(h * ratio)
-        logger.info(f"Capping input from {w}x{h} to {new_w}x{new_h} for speed")
+        logger.debug(f"Capping input from {w}x{h} to {new_w}x{new_h} for speed")
         image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
     return image
 
 
+def _face_landmarks(face: Dict[str, Any], sx: float, sy: float,
+                    offset: Tuple[int, int], region_w: int, region_h: int) -> np.ndarray:
+    """
+    Convert a client face entry to 5x2 landmarks in working image coordinates.
+
+    Raises:
+        ValueError: If the box or landmarks fall outside the processed region
+    """
+    if "landmarks" in face:
+        points = np.array(face["landmarks"], dtype=np.float32)
+        extent = points
+    else:
+        x1, y1, x2, y2 = face["box"]
+        size = np.array([x2 - x1, y2 - y1], dtype=np.float32)
+        points = np.array([x1, y1], dtype=np.float32) + BOX_LANDMARK_RATIOS * size
+        extent = np.array([[x1, y1], [x2, y2]], dtype=np.float32)
+
+    scale = np.array([sx, sy], dtype=np.float32)
+    origin = np.array(offset, dtype=np.float32)
+    points = points * scale - origin
+    extent = extent * scale - origin
+
+    # Half-pixel tolerance for rounding in the input cap / crop mapping
+    if (extent.min() < -0.5 or extent[:, 0].max() > region_w + 0.5
+            or extent[:, 1].max() > region_h + 0.5):
+        raise ValueError("Face lies outside the image or crop rectangle")
+
+    return points
+
+
+def _scale_crop(crop: Tuple[int, int, int, int], sx: float, sy: float,
+                w: int, h: int) -> Tuple[int, int, int, int]:
+    """Map a client crop rectangle to working image coordinates, clamped to bounds"""
+    x, y, cw, ch = crop
+    x0 = min(max(int(round(x * sx)), 0), w)
+    y0 = min(max(int(round(y * sy)), 0), h)
+    x1 = min(int(round((x + cw) * sx)), w)
+    y1 = min(int(round((y + ch) * sy)), h)
+    if x1 - x0 < 16 or y1 - y0 < 16:
+        raise ValueError("Crop rectangle is outside the image or too small")
+    return x0, y0, x1, y1
+
+
+def _restore_face(face_enhancer, cropped_face: np.ndarray) -> np.ndarray:
+    cropped_face_t = img2tensor(cropped_face / 255., bgr2rgb=True, float32=True)
+    normalize(cropped_face_t, (0.5, 0.5, 0.5), (0.5, 0.5, 0.5), inplace=True)
+    cropped_face_t = cropped_face_t.unsqueeze(0).to(face_enhancer.device)
+
+    try:
+        output = face_enhancer.gfpgan(cropped_face_t, return_rgb=False, weight=0.5)[0]
+        restored_face = tensor2img(output.squeeze(0), rgb2bgr=True, min_max=(-1, 1))
+    except RuntimeError as e:
+        logger.warning(f"GFPGAN inference failed for face: {e}")
+        restored_face = cropped_face
+
+    return restored_face.astype('uint8')
+
+
+def _enhance_with_landmarks(face_enhancer, image: np.ndarray,
+                            landmarks: List[np.ndarray]) -> np.ndarray:
+    """
+    Same as GFPGANer.enhance(paste_back=True) but with caller-provided
+    landmarks, so the RetinaFace detection pass is skipped.
+    """
+    face_helper = face_enhancer.face_helper
+    face_helper.clean_all()
+    face_helper.read_image(image)
+    face_helper.all_landmarks_5 = landmarks
+    face_helper.align_warp_face()
+
+    for cropped_face in face_helper.cropped_faces:
+        face_helper.add_restored_face(_restore_face(face_enhancer, cropped_face))
+
+    bg_img = None
+    if face_enhancer.bg_upsampler is not None:
+        bg_img = face_enhancer.bg_upsampler.enhance(image, outscale=face_enhancer.upscale)[0]
+
+    face_helper.get_inverse_affine(None)
+    return face_helper.paste_faces_to_input_image(upsample_img=bg_img)
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
 def enhance_image(
     image_bytes: bytes,
     scale: int = 2,
-    options: Optional[Dict[str, Any]] = None
+    options: Optional[Dict[str, Any]] = None,
+    timings: Optional[Dict[str, float]] = None
 ) -> bytes:
     if scale not in (2, 4):
         raise ValueError("Scale must be 2 or 4")
 
     if options is None:
         options = {}
+    if timings is None:
+        timings = {}
 
     version = options.get("version", "v1.4")
     if version not in ("v1.2", "v1.3", "v1.4"):
         version = "v1.4"
 
+    aligned = bool(options.get("aligned", False))
+    faces = options.get("faces")
+    crop = options.get("crop")
+    if aligned and (faces is not None or crop is not None):
+        raise ValueError("aligned mode cannot be combined with faces or crop")
+
     try:
+        start = time.perf_counter()
         nparr = np.frombuffer(image_bytes, np.uint8)
         image = cv2.imdecode(nparr, cv2.IMREAD_UNCHANGED)
 
@@ -144,9 +258,10 @@ def enhance_image(
         elif image.ndim == 2:
             image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
 
+        orig_h, orig_w = image.shape[:2]
         image = _cap_input_size(image)
         h, w = image.shape[:2]
-        logger.info(f"Processing image: {w}x{h}")
+        logger.debug(f"Processing image: {w}x{h}")
 
         if h < 300:
             image = cv2.resize(
@@ -155,18 +270,70 @@ def enhance_image(
                 interpolation=cv2.INTER_LANCZOS4,
             )
             h, w = image.shape[:2]
-            logger.info(f"Pre-upsampled small image to: {w}x{h}")
+            logger.debug(f"Pre-upsampled small image to: {w}x{h}")
+        timings["decode"] = _elapsed_ms(start)
 
+        start = time.perf_counter()
         face_enhancer = _get_face_enhancer(version)
-
-        with torch.inference_mode():
-            _, _, restored = face_enhancer.enhance(
-                image,
-                has_aligned=False,
-                only_center_face=False,
-                paste_back=True,
+        timings["model"] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        upscale = face_enhancer.upscale
+
+        if aligned:
+            # Pre-aligned face crop: no detection, no warping, no background pass
+            with torch.inference_mode():
+                _, restored_faces, _ = face_enhancer.enhance(
+                    image,
+                    has_aligned=True,
+                    only_center_face=False,
+                    paste_back=False,
+                )
+            restored = cv2.resize(
+                restored_faces[0],
+                (w * upscale, h * upscale),
+                interpolation=cv2.INTER_LANCZOS4,
             )
+        else:
+            sx, sy = w / orig_w, h / orig_h
+            x0, y0, x1, y1 = 0, 0, w, h
+            if crop is not None:
+                x0, y0, x1, y1 = _scale_crop(crop, sx, sy, w, h)
+                logger.debug(f"Processing region of interest: {x1 - x0}x{y1 - y0} at ({x0}, {y0})")
+            region = image[y0:y1, x0:x1]
+
+            with torch.inference_mode():
+                if faces is not None:
+                    landmarks = [
+                        _face_landmarks(face, sx, sy, (x0, y0), x1 - x0, y1 - y0)
+                        for face in faces
+                    ]
+                    logger.debug(f"Using {len(landmarks)} client-supplied face(s), skipping detection")
+                    restored = _enhance_with_landmarks(face_enhancer, region, landmarks)
+                else:
+                    _, _, restored = face_enhancer.enhance(
+                        region,
+                        has_aligned=False,
+                        only_center_face=False,
+                        paste_back=True,
+                    )
+
+            if crop is not None:
+                # Composite the enhanced region onto a cheaply resized full frame
+                background = cv2.resize(
+                    image,
+                    (w * upscale, h * upscale),
+                    interpolation=cv2.INTER_LANCZOS4,
+                )
+                rh, rw = restored.shape[:2]
+                channels = min(restored.shape[2], background.shape[2])
+                ry, rx = y0 * upscale, x0 * upscale
+                background[ry:ry + rh, rx:rx + rw, :channels] = restored[:, :, :channels]
+                restored = background
+
+        timings["restore"] = _elapsed_ms(start)
 
+        start = time.perf_counter()
         if not np.isclose(scale, 2.0):
             target_w = int(w * scale)
             target_h = int(h * scale)
@@ -176,14 +343,18 @@ def enhance_image(
                 interp = cv2.INTER_AREA
             restored = cv2.resize(restored, (target_w, target_h), interpolation=interp)
 
-        logger.info(f"Enhanced image: {restored.shape[1]}x{restored.shape[0]}")
+        logger.debug(f"Enhanced image: {restored.shape[1]}x{restored.shape[0]}")
 
         _, buffer = cv2.imencode('.png', restored, [cv2.IMWRITE_PNG_COMPRESSION, 3])
+        timings["encode"] = _elapsed_ms(start)
         return buffer.tobytes()
 
+    except ValueError:
+        # Client-caused (undecodable image, bad region); logged once as a 4xx record
+        raise
     except cv2.error as e:
-        logger.error(f"OpenCV error: {e}")
+        logger.error(f"OpenCV error: {e}", exc_info=True)
         raise ValueError(f"Image processing error: {str(e)}")
     except Exception as e:
-        logger.error(f"Enhancement failed: {e}")
+        logger.error(f"Enhancement failed: {e}", exc_info=True)
         raise ValueError(f"Image processing error: {str(e)}")
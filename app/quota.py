@@ -1,6 +1,6 @@
 """
 Rate limiting and quota management using Redis
-Tracks daily requests per IP address
+Tracks daily requests per IP address and per API key ID
 Redis is optional - if unavailable, rate limiting is disabled
 """
 
@@ -69,18 +69,20 @@ def check_and_increment_ip_quota(ip: str) -> Tuple[bool, int, int, str]:
         return True, 0, FREE_DAILY_LIMIT, ""
 
 
-def check_and_increment_api_key_quota(api_key_name: str) -> Tuple[bool, int, int, str]:
+def check_and_increment_api_key_quota(api_key_name: str,
+                                      limit: int = FREE_DAILY_LIMIT) -> Tuple[bool, int, int, str]:
     """
     Check and increment API key quota (for authenticated requests).
     
     Args:
-        api_key_name: Free API key identifier
+        api_key_name: API key ID
+        limit: Daily request limit for this key
         
     Returns:
         Tuple of (allowed, used, limit, reset_time)
     """
     if not REDIS_AVAILABLE or r is None:
-        return True, 0, FREE_DAILY_LIMIT, ""
+        return True, 0, limit, ""
     
     day = get_day_bucket()
     key = f"quota:apikey:{api_key_name}:{day}"
@@ -92,14 +94,14 @@ def check_and_increment_api_key_quota(api_key_name: str) -> Tuple[bool, int, int
             r.expire(key, 60 * 60 * 36)
             logger.info(f"New quota bucket created for API key {api_key_name}: {day}")
         
-        allowed = used <= FREE_DAILY_LIMIT
+        allowed = used <= limit
         reset_time = f"{day}T23:59:59Z"
         
-        return allowed, used, FREE_DAILY_LIMIT, reset_time
+        return allowed, used, limit, reset_time
         
     except Exception as e:
         logger.error(f"Quota check failed for API key {api_key_name}: {e}")
-        return True, 0, FREE_DAILY_LIMIT, ""
+        return True, 0, limit, ""
 
 
 def get_quota_stats() -> dict:
@@ -0,0 +1,171 @@
+"""
+Non-blocking logging and per-request structured records.
+
+All log records are handed to a QueueHandler unformatted and are
+formatted and written by a background QueueListener thread, so message
+rendering, JSON encoding and I/O stay off the request path.
+Each request produces a single JSON record with a trace ID, per-stage
+durations and outcome. Successful requests are sampled (LOG_SAMPLE_RATE),
+as are routine rejections (401/429, LOG_REJECT_SAMPLE_RATE); all other
+errors are always logged.
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import logging
+import logging.handlers
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_REJECT_SAMPLE_RATE = float(os.getenv("LOG_REJECT_SAMPLE_RATE", "0.01"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Rejections that an attacker or an over-quota client can generate at will
+SAMPLED_REJECT_STATUSES = {401, 429}
+
+request_logger = logging.getLogger("app.request")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues records as-is and drops them instead of
+    blocking when the queue is full.
+
+    The stock prepare() formats the record on the calling thread; here the
+    listener's handlers format it instead. Log arguments are therefore
+    rendered late, so callers must not mutate them after logging.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def setup_async_logging(level: str = "info"):
+    """
+    Route the root logger through a bounded queue drained by a background thread.
+
+    Also disables uvicorn's access log, which has its own handler, does not
+    propagate and writes one line per request on the event loop; the
+    structured request record replaces it. This covers ``uvicorn main:app``,
+    which configures logging before importing the app. ``uvicorn.run()``
+    re-applies its logging config after import, so callers must also pass
+    ``access_log=False`` there.
+
+    Args:
+        level: Root log level name
+    """
+    global _listener
+
+    if _listener is not None:
+        return
+
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+
+    handlers = root.handlers[:] or [logging.StreamHandler()]
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    for handler in handlers:
+        if handler.formatter is None:
+            handler.setFormatter(formatter)
+        root.removeHandler(handler)
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    root.addHandler(_DroppingQueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    logging.getLogger("uvicorn.access").disabled = True
+
+
+def stop_async_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class _JsonMessage:
+    """Defers json.dumps until the listener thread formats the record"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+
+    def __str__(self) -> str:
+        return json.dumps(self.data, default=str)
+
+
+class RequestLog:
+    """
+    Collects everything about one request and emits it as one record.
+
+    Attributes:
+        trace_id: Caller-supplied X-Request-ID or a generated hex ID
+        stages: Stage name -> duration in milliseconds
+        fields: Extra structured fields (sizes, quota outcome, ...)
+    """
+
+    def __init__(self, method: str, path: str, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.stages: Dict[str, float] = {}
+        self.fields: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block and record it under ``name``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    def emit(self, status_code: int):
+        """Log the record; successes and 401/429 are sampled, other errors are always kept"""
+        is_error = status_code >= 400 or self.error is not None
+        if status_code in SAMPLED_REJECT_STATUSES:
+            if random.random() >= LOG_REJECT_SAMPLE_RATE:
+                return
+        elif not is_error and random.random() >= LOG_SAMPLE_RATE:
+            return
+
+        record = {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "path": self.path,
+            "status": status_code,
+            "duration_ms": round((time.perf_counter() - self._start) * 1000, 2),
+            "stages_ms": dict(self.stages),
+            **self.fields,
+        }
+        if self.error is not None:
+            record["error"] = self.error
+
+        if status_code >= 500:
+            level = logging.ERROR
+        elif status_code in SAMPLED_REJECT_STATUSES:
+            level = logging.INFO
+        elif is_error:
+            level = logging.WARNING
+        else:
+            level = logging.INFO
+
+        request_logger.log(level, "%s", _JsonMessage(record))
@@ -2,8 +2,14 @@
 Utility functions for the API
 """
 
+import io
+import json
+import math
 import logging
+from typing import Any, Dict, List, Optional, Tuple
+
 from fastapi import Request
+from PIL import Image
 
 logger = logging.getLogger(__name__)
 
@@ -40,3 +46,125 @@ def format_image_size(size_bytes: int) -> str:
             return f"{size_bytes:.1f}{unit}"
         size_bytes /= 1024
     return f"{size_bytes:.1f}GB"
+
+
+def _is_coordinate(value: Any) -> bool:
+    """Finite int/float; rejects bools and the NaN/Infinity json.loads accepts"""
+    return (isinstance(value, (int, float)) and not isinstance(value, bool)
+            and math.isfinite(value))
+
+
+def parse_face_regions(raw: Optional[str],
+                       max_faces: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    Parse client-supplied face locations.
+
+    Accepts a JSON list where each entry is either a bounding box
+    ``[x1, y1, x2, y2]`` or five ``[x, y]`` landmarks (left eye, right eye,
+    nose, left mouth corner, right mouth corner), in input image pixels.
+
+    Args:
+        raw: JSON string from the ``faces`` query parameter
+        max_faces: Maximum number of faces accepted (each costs a GFPGAN pass)
+
+    Returns:
+        List of ``{"box": [...]}`` / ``{"landmarks": [...]}`` dicts, or None
+
+    Raises:
+        ValueError: If the value is not a valid face list
+    """
+    if raw is None or not raw.strip():
+        return None
+
+    try:
+        entries = json.loads(raw)
+    except json.JSONDecodeError:
+        raise ValueError("faces must be a JSON list")
+
+    if not isinstance(entries, list):
+        raise ValueError("faces must be a JSON list")
+
+    if len(entries) > max_faces:
+        raise ValueError(f"Too many faces ({len(entries)}, max {max_faces})")
+
+    faces = []
+    for entry in entries:
+        if not isinstance(entry, list):
+            raise ValueError("Each face must be a box or a list of 5 landmarks")
+
+        if len(entry) == 4 and all(_is_coordinate(v) for v in entry):
+            x1, y1, x2, y2 = (float(v) for v in entry)
+            if x2 <= x1 or y2 <= y1:
+                raise ValueError(f"Invalid face box: {entry}")
+            faces.append({"box": [x1, y1, x2, y2]})
+        elif len(entry) == 5 and all(
+                isinstance(p, list) and len(p) == 2
+                and all(_is_coordinate(v) for v in p)
+                for p in entry):
+            faces.append({"landmarks": [[float(x), float(y)] for x, y in entry]})
+        else:
+            raise ValueError("Each face must be a box or a list of 5 landmarks")
+
+    return faces
+
+
+def parse_crop_rect(raw: Optional[str]) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Parse a crop rectangle given as ``x,y,width,height`` in input image pixels.
+
+    Raises:
+        ValueError: If the value is malformed or has a non-positive size
+    """
+    if raw is None or not raw.strip():
+        return None
+
+    try:
+        x, y, w, h = (int(v) for v in raw.split(","))
+    except ValueError:
+        raise ValueError("crop must be x,y,width,height")
+
+    if x < 0 or y < 0 or w <= 0 or h <= 0:
+        raise ValueError("crop must have non-negative origin and positive size")
+
+    return x, y, w, h
+
+
+def get_image_size(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read image dimensions from the header without decoding pixels.
+
+    Returns:
+        (width, height), or None if the format header can't be read
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def validate_regions(faces: Optional[List[Dict[str, Any]]],
+                     crop: Optional[Tuple[int, int, int, int]],
+                     width: int, height: int):
+    """
+    Check that the crop rectangle and faces lie inside the image (and faces
+    inside the crop), so bad requests are rejected before quota is charged.
+
+    Raises:
+        ValueError: If a region falls outside the image or crop rectangle
+    """
+    x0, y0, x1, y1 = 0, 0, width, height
+    if crop is not None:
+        x, y, w, h = crop
+        if x >= width or y >= height:
+            raise ValueError("Crop rectangle is outside the image")
+        x0, y0, x1, y1 = x, y, min(x + w, width), min(y + h, height)
+
+    for face in faces or []:
+        if "box" in face:
+            bx1, by1, bx2, by2 = face["box"]
+            points = [(bx1, by1), (bx2, by2)]
+        else:
+            points = face["landmarks"]
+        if any(px < x0 or px > x1 or py < y0 or py > y1 for px, py in points):
+            raise ValueError("Face lies outside the image or crop rectangle")
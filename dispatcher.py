@@ -0,0 +1,211 @@
+"""
+GFPGAN API Dispatcher
+Load-aware front end for several API nodes
+
+Features:
+- Polls GET /load on every node (in-flight, queue depth, p95, resident models)
+- Routes each /enhance to the node with the lowest estimated wait
+- Prefers nodes that already have the requested GFPGAN version loaded
+- Drains nodes that stop answering and re-admits them when they recover
+
+Run:
+    DISPATCH_NODES=http://10.0.0.2:8000,http://10.0.0.3:8000 \\
+        uvicorn dispatcher:app --host 0.0.0.0 --port 8000 --no-access-log
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import Response, JSONResponse
+
+from app.dispatch import NodePool, normalize_version
+from app.request_log import setup_async_logging, stop_async_logging
+
+setup_async_logging(os.getenv("LOG_LEVEL", "info"))
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)  # one line per load poll otherwise
+
+DISPATCH_NODES = [
+    url.strip() for url in os.getenv("DISPATCH_NODES", "http://localhost:8001").split(",")
+    if url.strip()
+]
+DISPATCH_REQUEST_TIMEOUT = float(os.getenv("DISPATCH_REQUEST_TIMEOUT", "120"))
+
+# Node MAX_FILE_SIZE (50MB) plus room for the multipart envelope
+MAX_BODY_SIZE = 51 * 1024 * 1024
+
+# Hop-by-hop and length headers are recomputed on each leg
+EXCLUDED_REQUEST_HEADERS = {"host", "content-length", "connection", "keep-alive", "transfer-encoding"}
+EXCLUDED_RESPONSE_HEADERS = {"content-length", "content-encoding", "connection", "keep-alive", "transfer-encoding"}
+
+app = FastAPI(
+    title="GFPGAN API Dispatcher",
+    description="Routes /enhance to the least-loaded GFPGAN API node",
+    version="1.0.0",
+    docs_url="/docs",
+    openapi_url="/openapi.json")
+
+pool = NodePool(DISPATCH_NODES)
+_client: Optional[httpx.AsyncClient] = None
+_poll_task: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Poll all nodes once, then keep polling in the background"""
+    global _client, _poll_task
+
+    _client = httpx.AsyncClient(timeout=DISPATCH_REQUEST_TIMEOUT)
+    await pool.poll_once(_client)
+    _poll_task = asyncio.create_task(pool.poll_forever(_client))
+
+    healthy = sum(1 for n in pool.nodes.values() if n.healthy)
+    logger.info(f"🚦 Dispatcher started - {healthy}/{len(pool.nodes)} nodes healthy")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _poll_task is not None:
+        _poll_task.cancel()
+    if _client is not None:
+        await _client.aclose()
+    stop_async_logging()
+
+
+@app.get("/health", tags=["System"])
+async def health_check() -> Dict[str, Any]:
+    """
+    Health check endpoint.
+
+    Returns:
+        Status, healthy node count and timestamp
+    """
+    healthy = sum(1 for n in pool.nodes.values() if n.healthy)
+    return {
+        "status": "ok" if healthy else "degraded",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "service": "GFPGAN API Dispatcher",
+        "healthy_nodes": healthy,
+        "total_nodes": len(pool.nodes)
+    }
+
+
+@app.get("/nodes", tags=["System"])
+async def get_nodes() -> Dict[str, Any]:
+    """Current view of every node's load and health"""
+    return {"nodes": pool.snapshot()}
+
+
+def _payload_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Request too large (max {MAX_BODY_SIZE // (1024 * 1024)}MB)")
+
+
+async def _read_body(request: Request) -> bytes:
+    """Buffer the upload, refusing anything larger than a node would accept"""
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            if int(content_length) > MAX_BODY_SIZE:
+                raise _payload_too_large()
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Invalid Content-Length")
+
+    # Chunked uploads have no Content-Length; cap them while streaming
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_BODY_SIZE:
+            raise _payload_too_large()
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+@app.post("/enhance", tags=["Enhancement"])
+async def enhance(request: Request) -> Response:
+    """
+    Forward an enhancement request to the least-loaded healthy node.
+
+    The request is passed through unchanged (query string, headers, body),
+    so authentication and quota are still enforced by the node. Only
+    connection failures and connect timeouts are retried on another node,
+    since the request was never sent; once a node has accepted the request
+    its response is returned as-is. A timeout after that is a slow job
+    (504), not a node failure, and does not count towards draining.
+    """
+    version = normalize_version(request.query_params.get("version"))
+    body = await _read_body(request)
+
+    headers = {
+        k: v for k, v in request.headers.items()
+        if k.lower() not in EXCLUDED_REQUEST_HEADERS
+    }
+    client_ip = request.client.host if request.client else "unknown"
+    xff = request.headers.get("x-forwarded-for")
+    headers["X-Forwarded-For"] = f"{xff}, {client_ip}" if xff else client_ip
+
+    tried = set()
+    while True:
+        node = pool.choose(version, exclude=tried)
+        if node is None:
+            break
+
+        node.pending += 1
+        try:
+            upstream = await _client.post(f"{node.url}/enhance",
+                                          params=request.query_params,
+                                          content=body,
+                                          headers=headers)
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            logger.warning(f"Node {node.url} unreachable, retrying elsewhere: {e}")
+            pool.mark_failure(node)
+            tried.add(node.url)
+            continue
+        except httpx.TimeoutException as e:
+            logger.warning(f"Node {node.url} timed out after accepting request: {e!r}")
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                                detail="Upstream node timed out")
+        except httpx.HTTPError as e:
+            logger.error(f"Node {node.url} failed mid-request: {e}")
+            pool.mark_failure(node)
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY,
+                                detail="Upstream node failed")
+        finally:
+            node.pending -= 1
+
+        if upstream.status_code == 200:
+            pool.mark_served(node, version)
+
+        response_headers = {
+            k: v for k, v in upstream.headers.items()
+            if k.lower() not in EXCLUDED_RESPONSE_HEADERS
+        }
+        response_headers["X-Dispatched-Node"] = node.url
+        return Response(content=upstream.content,
+                        status_code=upstream.status_code,
+                        headers=response_headers)
+
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="No healthy API nodes available",
+                        headers={"Retry-After": "5"})
+
+
+@app.exception_handler(HTTPException)
+async def http_exception_handler(request: Request, exc: HTTPException):
+    """Custom exception handler"""
+    return JSONResponse(status_code=exc.status_code,
+                        content={"detail": exc.detail},
+                        headers=exc.headers)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000, access_log=False)
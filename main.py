@@ -12,23 +12,25 @@ Features:
 """
 
 import os
+import time
 import logging
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request, status
 from fastapi.responses import Response, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.pipeline import enhance_image, preload_models
-from app.quota import check_and_increment_ip_quota, check_and_increment_api_key_quota, get_quota_stats
-from app.utils import get_client_ip, format_image_size
-from app.auth import validate_api_key, get_free_api_key_name
+from app.pipeline import enhance_image, preload_models, get_loaded_versions
+from app import load
+from app.quota import check_and_increment_ip_quota, check_and_increment_api_key_quota, get_quota_stats, FREE_DAILY_LIMIT
+from app.utils import (get_client_ip, format_image_size, parse_face_regions, parse_crop_rect,
+                       get_image_size, validate_regions)
+from app.auth import validate_api_key, get_free_api_key_name, get_api_key_count, start_api_key_reloader
+from app.request_log import RequestLog, setup_async_logging, stop_async_logging
 
-# Logging configuration
-logging.basicConfig(
-    level=os.getenv("LOG_LEVEL", "info").upper(),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+# Logging configuration (queue-based, written by a background thread)
+setup_async_logging(os.getenv("LOG_LEVEL", "info"))
 logger = logging.getLogger(__name__)
 
 # App initialization
@@ -51,7 +53,9 @@ app.add_middleware(
 
 # Constants
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+MAX_FACES = int(os.getenv("MAX_FACES", "20"))  # Client-supplied faces per request
 ALLOWED_FORMATS = {"image/jpeg", "image/png", "image/webp", "image/tiff"}
+UNLOGGED_PATHS = {"/health", "/load"}  # Polled every second by the dispatcher and probes
 
 
 @app.on_event("startup")
@@ -68,13 +72,56 @@ async def startup_event():
     else:
         logger.warning("⚠️  Redis not available - rate limiting disabled")
 
+    start_api_key_reloader()
     logger.info(f"📊 Free API Key: freeApiluminascalem***")
-    logger.info(f"📊 Daily limit: 10,000 requests")
+    logger.info(f"📊 API keys loaded: {get_api_key_count()}")
+    logger.info(f"📊 Default daily limit: {FREE_DAILY_LIMIT:,} requests")
     logger.info("=" * 60)
 
     preload_models()
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending log records"""
+    stop_async_logging()
+
+
+@app.middleware("http")
+async def request_logging_middleware(request: Request, call_next):
+    """Emit one structured log record per request"""
+    if request.url.path in UNLOGGED_PATHS:
+        return await call_next(request)
+
+    request_log = RequestLog(request.method,
+                             request.url.path,
+                             trace_id=request.headers.get("X-Request-ID"))
+    request.state.request_log = request_log
+
+    track_load = request.url.path == "/enhance"
+    if track_load:
+        load.request_started()
+    start = time.perf_counter()
+
+    try:
+        response = await call_next(request)
+    except Exception as e:
+        if track_load:
+            load.request_finished()
+        request_log.error = repr(e)
+        request_log.emit(status.HTTP_500_INTERNAL_SERVER_ERROR)
+        raise
+
+    if track_load:
+        # Only successful runs feed p95, fast rejections would skew it down
+        load.request_finished((time.perf_counter() - start) * 1000
+                              if response.status_code == 200 else None)
+
+    response.headers["X-Trace-ID"] = request_log.trace_id
+    request_log.emit(response.status_code)
+    return response
+
+
 @app.get("/health", tags=["System"])
 async def health_check() -> Dict[str, Any]:
     """
@@ -101,13 +148,28 @@ async def get_stats() -> Dict[str, Any]:
     """
     stats = get_quota_stats()
     return {
-        **stats, "daily_limit_per_key": 10000,
-        "daily_limit_per_ip": 10000,
+        **stats, "default_daily_limit_per_key": FREE_DAILY_LIMIT,
+        "daily_limit_per_ip": FREE_DAILY_LIMIT,
         "free_api_key_name": "freeApiluminascalem",
+        "api_keys_loaded": get_api_key_count(),
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }
 
 
+@app.get("/load", tags=["System"])
+async def get_load() -> Dict[str, Any]:
+    """
+    Lightweight load report polled by the dispatcher.
+    
+    Returns:
+        In-flight requests, queue depth, recent p95 and resident models
+    """
+    return {
+        **load.get_load_report(),
+        "models_resident": get_loaded_versions(),
+    }
+
+
 @app.get("/", tags=["Info"])
 async def root():
     """API root endpoint"""
@@ -145,13 +207,17 @@ async def root():
 async def enhance(request: Request,
                   file: UploadFile = File(...),
                   version: str = "v1.4",
-                  scale: int = 2) -> Response:
+                  scale: int = 2,
+                  aligned: bool = False,
+                  faces: Optional[str] = None,
+                  crop: Optional[str] = None) -> Response:
     """
     Enhance image using GFPGAN face restoration + Real-ESRGAN 4x background upsampling.
     
     **Authentication Required:** Pass `X-API-Key` header
     
     **Free Tier:** 10,000 requests per 24-hour period per API key
+    (issued keys may carry their own daily limit)
     
     **Free API Key:** `freeApiluminascalem!+|I1,R1u31C_V`
     
@@ -161,10 +227,20 @@ async def enhance(request: Request,
     3. Real-ESRGAN 4x background upsampling (SRVGGNetCompact, fast mode)
     4. Final resize to requested scale factor
     
+    **Client-supplied regions (optional):**
+    - `faces` skips face detection and aligns from the given boxes/landmarks
+    - `crop` restricts enhancement to a rectangle; the rest of the frame is
+      resized with LANCZOS4 and the enhanced region is composited back
+    - `aligned=true` treats the upload as a pre-aligned 512x512 face crop
+    
     Args:
         file: Image file (JPG, PNG, WebP, TIFF)
         version: GFPGAN checkpoint - v1.4 (sharpest, most natural), v1.3, or v1.2 (default: v1.4)
         scale: Final upscale factor (2 or 4, default: 2)
+        aligned: Input is an already aligned face crop (default: false)
+        faces: JSON list of face boxes `[x1,y1,x2,y2]` or 5-point landmarks
+            `[[x,y],...]` in input pixels
+        crop: Region of interest as `x,y,width,height` in input pixels
         
     Returns:
         Enhanced image as PNG
@@ -179,46 +255,64 @@ async def enhance(request: Request,
         - 500: Processing errors
     """
 
+    request_log: RequestLog = request.state.request_log
+
     # Get client IP
     client_ip = get_client_ip(request)
+    request_log.fields.update({
+        "client_ip": client_ip,
+        "scale": scale,
+        "version": version,
+        "aligned": aligned,
+    })
 
     # Check for API key authentication
     api_key = request.headers.get("X-API-Key")
     is_authenticated = False
     quota_identifier = None
+    key_record = None
 
     if api_key:
-        is_valid, message = validate_api_key(api_key)
+        is_valid, message, key_record = validate_api_key(api_key)
         if not is_valid:
-            logger.warning(f"Invalid API key attempt from {client_ip}")
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail=message,
                                 headers={"WWW-Authenticate": "Bearer"})
         is_authenticated = True
-        quota_identifier = "freeApiluminascalem"  # Use key name for quota tracking
-        logger.info(f"✅ Authenticated request from {client_ip} with API key")
+        quota_identifier = key_record.id  # Use key ID for quota tracking
+        request_log.fields["api_key_id"] = key_record.id
     else:
         # Use IP-based tracking as fallback
         quota_identifier = client_ip
-        logger.info(f"📝 IP-based request from {client_ip} (no API key)")
-
-    logger.info(f"Enhancement request - scale: {scale}x")
 
     # Validate scale parameter
     if scale not in (2, 4):
-        logger.warning(f"Invalid scale parameter: {scale}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Scale must be 2 or 4")
 
+    # Validate region parameters
+    try:
+        face_regions = parse_face_regions(faces, MAX_FACES)
+        crop_rect = parse_crop_rect(crop)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=str(e))
+
+    if aligned and (face_regions is not None or crop_rect is not None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="aligned=true cannot be combined with faces or crop")
+
     # Validate file size
     file_size = 0
     try:
         # Peek at file size
-        file_content = await file.read()
+        with request_log.stage("read"):
+            file_content = await file.read()
         file_size = len(file_content)
+        request_log.fields["input_bytes"] = file_size
 
         if file_size > MAX_FILE_SIZE:
-            logger.warning(f"File too large: {format_image_size(file_size)}")
             raise HTTPException(
                 status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
                 detail=
@@ -231,7 +325,6 @@ async def enhance(request: Request,
         # Validate MIME type
         mime_type = file.content_type
         if mime_type not in ALLOWED_FORMATS:
-            logger.warning(f"Unsupported format: {mime_type}")
             raise HTTPException(
                 status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
                 detail=
@@ -241,23 +334,37 @@ async def enhance(request: Request,
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"File validation error: {e}")
+        request_log.error = f"File validation error: {e}"
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Invalid file")
 
+    # Check regions against the image before charging quota. If the header
+    # can't be read here, the pipeline repeats the check after decoding
+    # (that late failure still costs a quota unit).
+    if face_regions is not None or crop_rect is not None:
+        image_size = get_image_size(file_content)
+        if image_size is not None:
+            try:
+                validate_regions(face_regions, crop_rect, *image_size)
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail=str(e))
+
     # Check quota based on authentication method
-    if is_authenticated:
-        allowed, used, limit, reset_time = check_and_increment_api_key_quota(
-            quota_identifier)
-        logger.info(f"API Key quota check: {used}/{limit}")
-    else:
-        allowed, used, limit, reset_time = check_and_increment_ip_quota(
-            quota_identifier)
-        logger.info(f"IP quota check: {used}/{limit}")
+    with request_log.stage("quota"):
+        if is_authenticated:
+            allowed, used, limit, reset_time = check_and_increment_api_key_quota(
+                quota_identifier, key_record.daily_limit)
+        else:
+            allowed, used, limit, reset_time = check_and_increment_ip_quota(
+                quota_identifier)
+    request_log.fields["quota"] = {
+        "allowed": allowed,
+        "used": used,
+        "limit": limit,
+    }
 
     if not allowed:
-        logger.warning(
-            f"Quota exceeded for {quota_identifier}: {used}/{limit}")
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail=
@@ -271,19 +378,20 @@ async def enhance(request: Request,
 
     # Process image
     try:
-        logger.info(f"Processing image ({format_image_size(file_size)})...")
-
         enhancement_options = {
             "version": version,
+            "aligned": aligned,
+            "faces": face_regions,
+            "crop": crop_rect,
         }
 
-        enhanced_bytes = enhance_image(file_content,
-                                       scale=scale,
-                                       options=enhancement_options)
-
-        logger.info(
-            f"✅ Enhancement complete - Output: {format_image_size(len(enhanced_bytes))}"
-        )
+        # Off the event loop, so /load keeps answering during long jobs
+        enhanced_bytes = await load.run_model(enhance_image,
+                                              file_content,
+                                              scale=scale,
+                                              options=enhancement_options,
+                                              timings=request_log.stages)
+        request_log.fields["output_bytes"] = len(enhanced_bytes)
 
         # Return enhanced image with quota headers
         return Response(content=enhanced_bytes,
@@ -299,11 +407,12 @@ async def enhance(request: Request,
                         })
 
     except ValueError as e:
-        logger.error(f"Image processing error: {e}")
+        request_log.error = str(e)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail=str(e))
     except Exception as e:
-        logger.error(f"Unexpected error: {e}", exc_info=True)
+        request_log.error = repr(e)
+        logger.error(f"[{request_log.trace_id}] Unexpected error: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Image processing failed. Please try again.")
@@ -311,8 +420,10 @@ async def enhance(request: Request,
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    """Custom exception handler"""
-    logger.error(f"HTTP {exc.status_code}: {exc.detail}")
+    """Custom exception handler (the request log middleware records the outcome)"""
+    request_log = getattr(request.state, "request_log", None)
+    if request_log is not None and request_log.error is None:
+        request_log.error = str(exc.detail)
     return JSONResponse(status_code=exc.status_code,
                         content={"detail": exc.detail},
                         headers=exc.headers)
@@ -320,4 +431,4 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=5000)
+    uvicorn.run(app, host="0.0.0.0", port=5000, access_log=False)
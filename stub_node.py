@@ -0,0 +1,59 @@
+"""
+Stand-in API node for exercising dispatcher.py without GFPGAN models.
+
+Serves the same GET /load and POST /enhance contract as main.py and uses
+the same load tracking and model slot (app.load), but /enhance sleeps for
+STUB_DELAY seconds instead of running the pipeline.
+
+Run:
+    STUB_DELAY=3 STUB_VERSION=v1.4 uvicorn stub_node:app --port 8001
+"""
+
+import os
+import time
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+from app import load
+
+STUB_DELAY = float(os.getenv("STUB_DELAY", "0.2"))
+STUB_VERSION = os.getenv("STUB_VERSION", "v1.4")
+
+app = FastAPI(title="GFPGAN Stub Node", version="1.0.0")
+
+
+@app.middleware("http")
+async def load_tracking_middleware(request: Request, call_next):
+    """Same /enhance accounting as main.py"""
+    if request.url.path != "/enhance":
+        return await call_next(request)
+
+    load.request_started()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        load.request_finished()
+        raise
+    load.request_finished((time.perf_counter() - start) * 1000
+                          if response.status_code == 200 else None)
+    return response
+
+
+@app.get("/load")
+async def get_load() -> Dict[str, Any]:
+    return {**load.get_load_report(), "models_resident": [STUB_VERSION]}
+
+
+def _fake_enhance(body: bytes) -> bytes:
+    time.sleep(STUB_DELAY)
+    return body[:16]
+
+
+@app.post("/enhance")
+async def enhance(request: Request) -> Response:
+    body = await request.body()
+    result = await load.run_model(_fake_enhance, body)
+    return Response(content=result, media_type="image/png")
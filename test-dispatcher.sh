@@ -0,0 +1,156 @@
+#!/bin/bash
+
+# Test script for the multi-node dispatcher
+# Starts three stub nodes (one slow) and a dispatcher as local processes
+# No GPU or model weights needed - see stub_node.py
+
+BASE_PORT="${1:-8100}"
+DISPATCHER_PORT=$BASE_PORT
+SLOW_PORT=$((BASE_PORT + 1))
+FAST_PORT_1=$((BASE_PORT + 2))
+FAST_PORT_2=$((BASE_PORT + 3))
+DISPATCHER="http://localhost:$DISPATCHER_PORT"
+
+echo "╔════════════════════════════════════════════════════════════╗"
+echo "║          GFPGAN Dispatcher - Test Suite                    ║"
+echo "╚════════════════════════════════════════════════════════════╝"
+echo ""
+
+# Colors
+RED='\033[0;31m'
+GREEN='\033[0;32m'
+NC='\033[0m' # No Color
+
+test_count=0
+pass_count=0
+pids=()
+
+cleanup() {
+    for pid in "${pids[@]}"; do
+        kill "$pid" 2>/dev/null
+    done
+    rm -f /tmp/dispatcher_test_payload.bin
+}
+trap cleanup EXIT
+
+# Test helper
+run_test() {
+    local name=$1
+    local cmd=$2
+
+    test_count=$((test_count + 1))
+    echo -n "Test $test_count: $name... "
+
+    if eval "$cmd" > /dev/null 2>&1; then
+        echo -e "${GREEN}✅ PASS${NC}"
+        pass_count=$((pass_count + 1))
+    else
+        echo -e "${RED}❌ FAIL${NC}"
+    fi
+}
+
+# Read a field of one node from the dispatcher's /nodes view
+node_field() {
+    local port=$1
+    local field=$2
+    curl -s "$DISPATCHER/nodes" | python3 -c "
+import json, sys
+for node in json.load(sys.stdin)['nodes']:
+    if node['url'].endswith(':$port'):
+        print(node['$field'])
+"
+}
+
+start_node() {
+    local port=$1
+    local delay=$2
+    STUB_DELAY=$delay uvicorn stub_node:app --port "$port" --log-level warning --no-access-log &
+    pids+=($!)
+}
+
+echo "🚀 Starting stub nodes and dispatcher..."
+start_node $SLOW_PORT 3
+start_node $FAST_PORT_1 0.2
+fast_2_pid_index=${#pids[@]}
+start_node $FAST_PORT_2 0.2
+sleep 2
+
+DISPATCH_NODES="http://localhost:$SLOW_PORT,http://localhost:$FAST_PORT_1,http://localhost:$FAST_PORT_2" \
+DISPATCH_POLL_SECONDS=0.5 \
+    uvicorn dispatcher:app --port "$DISPATCHER_PORT" --log-level warning --no-access-log &
+pids+=($!)
+sleep 2
+
+echo ""
+echo "📋 Testing routing..."
+echo ""
+
+# 1. All nodes admitted
+run_test "All nodes healthy" "curl -s $DISPATCHER/health | grep -q '\"healthy_nodes\":3'"
+
+# Occupy the slow node with three 3s jobs (one running, two queued)
+for i in 1 2 3; do
+    curl -s -o /dev/null -X POST "http://localhost:$SLOW_PORT/enhance" --data-binary "job$i" &
+done
+sleep 0.5
+
+# 2. /load still answers while a job runs
+run_test "Busy node answers /load" "curl -s --max-time 0.5 http://localhost:$SLOW_PORT/load | grep -q in_flight"
+
+# 3. Waiting jobs show up as queue depth
+run_test "Busy node reports queue depth" "[ \"\$(curl -s http://localhost:$SLOW_PORT/load | python3 -c 'import json,sys; print(json.load(sys.stdin)[\"queue_depth\"])')\" -ge 1 ]"
+
+sleep 2
+
+# 4. Slow node stays in rotation
+run_test "Busy node not drained" "[ \"\$(node_field $SLOW_PORT healthy)\" = True ]"
+
+# 5. New work avoids the busy node
+run_test "Requests avoid busy node" "! curl -s -D - -o /dev/null -X POST $DISPATCHER/enhance --data-binary x | grep -qi 'x-dispatched-node: .*:$SLOW_PORT'"
+
+# 6. Oversized uploads rejected before buffering
+head -c $((52 * 1024 * 1024)) /dev/zero > /tmp/dispatcher_test_payload.bin
+run_test "Oversized upload rejected" "[ \"\$(curl -s -o /dev/null -w '%{http_code}' -X POST $DISPATCHER/enhance --data-binary @/tmp/dispatcher_test_payload.bin)\" = 413 ]"
+
+echo ""
+echo "🩺 Testing draining..."
+echo ""
+
+# 7. Frozen node drained (still accepts connections but never answers)
+kill -STOP "${pids[1]}"
+sleep 4
+run_test "Frozen node drained" "[ \"\$(node_field $FAST_PORT_1 healthy)\" = False ]"
+
+# 8. Thawed node re-admitted
+kill -CONT "${pids[1]}"
+sleep 2
+run_test "Recovered node re-admitted" "[ \"\$(node_field $FAST_PORT_1 healthy)\" = True ]"
+
+# 9. Dead node drained
+kill "${pids[$fast_2_pid_index]}" 2>/dev/null
+sleep 3
+run_test "Dead node drained" "[ \"\$(node_field $FAST_PORT_2 healthy)\" = False ]"
+
+# 10. No nodes left
+for pid in "${pids[@]:0:$fast_2_pid_index}"; do
+    kill "$pid" 2>/dev/null
+done
+sleep 3
+run_test "503 with no healthy nodes" "[ \"\$(curl -s -o /dev/null -w '%{http_code}' -X POST $DISPATCHER/enhance --data-binary x)\" = 503 ]"
+
+echo ""
+echo "╔════════════════════════════════════════════════════════════╗"
+echo "║                      Test Summary                           ║"
+echo "╠════════════════════════════════════════════════════════════╣"
+echo "║  Total Tests:  $test_count                                     ║"
+echo "║  Passed:       ${GREEN}$pass_count${NC}                                      ║"
+echo "║  Failed:       $((test_count - pass_count))                                      ║"
+echo "╚════════════════════════════════════════════════════════════╝"
+
+if [ $pass_count -eq $test_count ]; then
+    echo -e "\n${GREEN}✅ All tests passed!${NC}\n"
+    exit 0
+else
+    echo -e "\n${RED}⚠️  Some tests failed${NC}\n"
+    exit 1
+fi
@@ -93,11 +93,41 @@ run_test "Invalid scale error" "curl -s -X POST '$API_URL/enhance?scale=3' -F 'f
 # 8. Missing file
 run_test "Missing file error" "curl -s -X POST '$API_URL/enhance?scale=2' | grep -q '422'"
 
+echo ""
+echo "🎯 Testing region parameters..."
+echo ""
+
+# Status code of an /enhance call with the test image and extra query params
+enhance_status() {
+    curl -s -o /dev/null -w '%{http_code}' -X POST "$API_URL/enhance?scale=2&$1" -F 'file=@test_image.jpg'
+}
+
+# 30 boxes, above MAX_FACES (default 20)
+too_many_faces="%5B$(python3 -c "print(','.join(['%5B0,0,10,10%5D'] * 30))")%5D"
+
+# 9. Malformed faces
+run_test "Malformed faces error" "[ \"\$(enhance_status 'faces=notjson')\" = 400 ]"
+
+# 10. Non-finite face coordinates
+run_test "NaN face box error" "[ \"\$(enhance_status 'faces=%5B%5BNaN,0,10,10%5D%5D')\" = 400 ]"
+
+# 11. Too many faces
+run_test "Too many faces error" "[ \"\$(enhance_status \"faces=$too_many_faces\")\" = 400 ]"
+
+# 12. Face outside the image (test image is 256x256)
+run_test "Face outside image error" "[ \"\$(enhance_status 'faces=%5B%5B300,300,400,400%5D%5D')\" = 400 ]"
+
+# 13. Malformed crop
+run_test "Malformed crop error" "[ \"\$(enhance_status 'crop=1,2,3')\" = 400 ]"
+
+# 14. aligned cannot be combined with crop
+run_test "Aligned with crop error" "[ \"\$(enhance_status 'aligned=true&crop=0,0,100,100')\" = 400 ]"
+
 echo ""
 echo "🔐 Testing rate limiting..."
 echo ""
 
-# 9. Check quota headers
+# 15. Check quota headers
 run_test "Quota headers" "curl -s -i -X POST '$API_URL/enhance?scale=2' -F 'file=@test_image.jpg' | grep -q 'X-Quota-Used'"
 
 echo ""